@@ -0,0 +1,209 @@
+# backfill.py
+# Regenerate daily reports + aggregates for a date range (after schema/metric changes)
+#
+# Local (process pool, uses your AWS credentials):
+#   python backfill.py --start 2024-10-01 --end 2025-09-30 \
+#       --processed-bucket ecommerce-processed-dev-xxx --reports-bucket ecommerce-reports-dev-xxx
+#
+# AWS (fan out to the deployed report-generator Lambda, bounded concurrency):
+#   python backfill.py --start 2024-10-01 --end 2025-09-30 --mode lambda \
+#       --function-name ecommerce-report-generator-dev --workers 20
+#
+# Completed days are recorded in a checkpoint file - re-run the same command to resume.
+# The checkpoint is tied to the date range and removed once a run finishes cleanly.
+
+import argparse
+import importlib.util
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+REPORT_GENERATOR_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'src', 'lambda', 'report-generator', 'lambda_function.py'
+)
+
+# Report-generator module, loaded ONCE per worker process (clients + config reused for every day)
+_report = None
+
+def load_report_module():
+    """Import the report-generator Lambda code (its folder name is not a valid package)"""
+    global _report
+    if _report is None:
+        spec = importlib.util.spec_from_file_location('report_generator', REPORT_GENERATOR_PATH)
+        _report = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_report)
+    return _report
+
+# Report-generator timeout is 300s (lambda.tf) - wait for it rather than re-invoking
+LAMBDA_READ_TIMEOUT = 310
+
+def plan_days(start, end, done):
+    """One work item per day in [start, end], skipping days already checkpointed"""
+    days = []
+    day = start
+    while day <= end:
+        if str(day) not in done:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+def load_checkpoint(path, start, end):
+    """
+    Return the set of completed days (as YYYY-MM-DD strings)
+    A checkpoint left by a backfill of a different range is ignored
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('range') != [str(start), str(end)]:
+        print(f"⚠️ Ignoring checkpoint {path} from range {checkpoint.get('range')}")
+        return set()
+    return set(checkpoint.get('completed', []))
+
+def save_checkpoint(path, start, end, done):
+    """Write checkpoint atomically so a crash never leaves a half-written file"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({
+            'range': [str(start), str(end)],
+            'completed': sorted(done),
+            'updated_at': datetime.utcnow().isoformat()
+        }, f)
+    os.replace(tmp, path)
+
+def run_day_local(day, notify):
+    """Worker: build one day's report in this process"""
+    return load_report_module().build_daily_report(day, notify=notify, strict=True)
+
+def run_day_lambda(client, function_name, day, notify):
+    """Worker: invoke the deployed report-generator for one day"""
+    response = client.invoke(
+        FunctionName=function_name,
+        InvocationType='RequestResponse',
+        Payload=json.dumps({'report_date': str(day), 'send_email': notify, 'strict': True})
+    )
+    payload = json.loads(response['Payload'].read())
+    if response.get('FunctionError'):
+        raise RuntimeError(payload.get('errorMessage', 'Lambda invocation failed'))
+    return json.loads(payload['body'])
+
+def rollup(start, end):
+    """
+    Merge stored daily aggregates for the range and save the rollup
+    Refuses (exit 1) to write a rollup if any day has no stored aggregate
+    """
+    report = load_report_module()
+    aggregates = []
+    missing = []
+    day = start
+    while day <= end:
+        agg = report.load_daily_aggregate(day)
+        if agg is None:
+            missing.append(day)
+        else:
+            aggregates.append(agg)
+        day += timedelta(days=1)
+
+    if missing:
+        print(f"❌ No stored aggregate for {len(missing)} days: {', '.join(str(d) for d in missing)}")
+        print("⚠️ Rollup not written - backfill those days first")
+        raise SystemExit(1)
+
+    merged = report.merge_aggregates(aggregates)
+    key = f"aggregates/rollup/aggregate_{start.strftime('%Y%m%d')}_{end.strftime('%Y%m%d')}.json"
+    report.s3.put_object(
+        Bucket=report.REPORTS_BUCKET,
+        Key=key,
+        Body=json.dumps(merged).encode('utf-8'),
+        ContentType='application/json'
+    )
+    metrics = report.summarize_aggregate(merged)
+    print(f"📊 Rollup of {len(aggregates)} days: {metrics['orders']} orders, {report.format_rupees(metrics['revenue_paise'])}")
+    print(f"💾 Rollup saved: s3://{report.REPORTS_BUCKET}/{key}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill daily reports for a date range')
+    parser.add_argument('--start', required=True, help='First day (YYYY-MM-DD)')
+    parser.add_argument('--end', required=True, help='Last day, inclusive (YYYY-MM-DD)')
+    parser.add_argument('--mode', choices=['local', 'lambda'], default='local')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                        help='Processes (local) or concurrent invocations (lambda)')
+    parser.add_argument('--function-name', default='ecommerce-report-generator-dev')
+    parser.add_argument('--processed-bucket', help='Overrides PROCESSED_BUCKET (local mode)')
+    parser.add_argument('--reports-bucket', help='Overrides REPORTS_BUCKET')
+    parser.add_argument('--checkpoint', default='.backfill_checkpoint.json')
+    parser.add_argument('--send-email', action='store_true', help='Email every report (off by default)')
+    parser.add_argument('--rollup', action='store_true', help='Merge daily aggregates for the range when done')
+    args = parser.parse_args()
+
+    start = datetime.strptime(args.start, '%Y-%m-%d').date()
+    end = datetime.strptime(args.end, '%Y-%m-%d').date()
+    if end < start:
+        parser.error('--end must not be before --start')
+
+    # Config must be in the environment before the report module is imported
+    if args.processed_bucket:
+        os.environ['PROCESSED_BUCKET'] = args.processed_bucket
+    if args.reports_bucket:
+        os.environ['REPORTS_BUCKET'] = args.reports_bucket
+
+    # Fail now, not after a year of days has run
+    if args.mode == 'local' and not os.environ.get('PROCESSED_BUCKET'):
+        parser.error('--processed-bucket (or PROCESSED_BUCKET) is required in local mode')
+    if (args.mode == 'local' or args.rollup) and not os.environ.get('REPORTS_BUCKET'):
+        parser.error('--reports-bucket (or REPORTS_BUCKET) is required in local mode and for --rollup')
+
+    done = load_checkpoint(args.checkpoint, start, end)
+    days = plan_days(start, end, done)
+    total_days = (end - start).days + 1
+    print(f"🗓️ {total_days} days in range, {total_days - len(days)} already done, {len(days)} to run")
+
+    failed = []
+    started = datetime.utcnow()
+
+    if args.mode == 'local':
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=load_report_module)
+        submit = lambda day: executor.submit(run_day_local, day, args.send_email)
+    else:
+        import boto3
+        from botocore.config import Config
+        # No SDK retries: a timed-out call would re-run a day that is still running
+        client = boto3.client('lambda', config=Config(
+            read_timeout=LAMBDA_READ_TIMEOUT,
+            retries={'max_attempts': 0}
+        ))
+        executor = ThreadPoolExecutor(max_workers=args.workers)
+        submit = lambda day: executor.submit(run_day_lambda, client, args.function_name, day, args.send_email)
+
+    with executor:
+        futures = {submit(day): day for day in days}
+        for future in as_completed(futures):
+            day = futures[future]
+            try:
+                result = future.result()
+                done.add(str(day))
+                save_checkpoint(args.checkpoint, start, end, done)
+                print(f"✅ {day}: {result['orders']} orders")
+            except Exception as e:
+                failed.append(day)
+                print(f"❌ {day}: {e}")
+
+    elapsed = (datetime.utcnow() - started).total_seconds()
+    print(f"🏁 {len(days) - len(failed)}/{len(days)} days in {elapsed:.1f}s")
+
+    if failed:
+        print(f"⚠️ Failed days (re-run to retry): {', '.join(str(d) for d in sorted(failed))}")
+        raise SystemExit(1)
+
+    # Clean run - a later backfill (e.g. after the next metric change) must start fresh
+    if os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    if args.rollup:
+        rollup(start, end)
+
+if __name__ == "__main__":
+    main()
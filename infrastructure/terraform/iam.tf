@@ -40,7 +40,8 @@ resource "aws_iam_role_policy" "lambda_processor_s3" {
       {
         Effect = "Allow"
         Action = [
-          "s3:PutObject"
+          "s3:PutObject",
+          "s3:AbortMultipartUpload"
         ]
         Resource = "${aws_s3_bucket.processed_data.arn}/*"
       }
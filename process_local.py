@@ -0,0 +1,298 @@
+# process_local.py
+# Reprocess local archives of orders_YYYYMMDD.csv files - no S3 involved
+# Same validation/transformation as the data-processor Lambda, on all CPU cores
+#
+#   python process_local.py archive/ --output rebuild/ --workers 8
+#
+# Output mirrors the processed bucket:
+#   rebuild/processed/YYYY/MM/DD/orders_YYYYMMDD.json           (valid orders)
+#   rebuild/quarantine/YYYY/MM/DD/orders_YYYYMMDD.csv           (rejected rows)
+# Files bigger than --chunk-mb are split into row ranges -> ..._part001.json, ...
+# A file's outputs are staged as *.tmp and replace the previous ones only once
+# every part of that file succeeded - failed or interrupted runs keep old outputs.
+
+import argparse
+import csv
+import fnmatch
+import glob
+import importlib.util
+import io
+import json
+import mmap
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+DATA_PROCESSOR_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'src', 'lambda', 'data-processor', 'lambda_function.py'
+)
+
+# Data-processor module, loaded ONCE per worker process
+_processor = None
+
+def load_processor_module():
+    """Import the data-processor Lambda code (its folder name is not a valid package)"""
+    global _processor
+    if _processor is None:
+        spec = importlib.util.spec_from_file_location('data_processor', DATA_PROCESSOR_PATH)
+        _processor = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_processor)
+    return _processor
+
+# YYYYMMDD in the file name - same rule as the Lambda, minus its "use today" fallback
+FILE_DATE = re.compile(r'(\d{8})')
+
+class LocalQuarantineWriter:
+    """Stream rejected raw rows to a local CSV (file only created on first bad row)"""
+
+    def __init__(self, path, fieldnames, processor):
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.processor = processor
+        self.file = None
+        self.writer = None
+
+    def write(self, line, row, error):
+        if self.file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.file = open(self.path, 'w', newline='', encoding='utf-8')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(self.processor.quarantine_header(self.fieldnames))
+        self.writer.writerow(self.processor.quarantine_record(self.fieldnames, line, row, error))
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+class MappedRange(io.RawIOBase):
+    """Read-only stream over mm[start:end] - no full copy of the range"""
+
+    def __init__(self, mm, start, end):
+        self.mm = mm
+        self.pos = start
+        self.end = end
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), self.end - self.pos)
+        buffer[:n] = self.mm[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+def mm_open(f):
+    """Read-only memory map of an open file"""
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def file_date_path(path):
+    """'YYYY/MM/DD' from orders_YYYYMMDD.csv, or None if the name has no valid date"""
+    match = FILE_DATE.search(os.path.basename(path))
+    if not match:
+        return None
+    try:
+        return datetime.strptime(match.group(1), '%Y%m%d').strftime('%Y/%m/%d')
+    except ValueError:
+        return None
+
+def find_csv_files(inputs, pattern):
+    """All matching CSVs under the given files/directories, sorted"""
+    files = []
+    for path in inputs:
+        if os.path.isfile(path):
+            files.append(path)
+            continue
+        for root, _, names in os.walk(path):
+            files.extend(os.path.join(root, n) for n in names if fnmatch.fnmatch(n, pattern))
+    return sorted(files)
+
+def plan_shards(path, chunk_size, date_path):
+    """
+    Split one file into row ranges of ~chunk_size bytes, cut on line boundaries
+    Returns [(path, start, end, first_line, part, parts, date_path)]
+    Note: assumes no quoted newlines inside fields (true for our exports)
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+
+    with open(path, 'rb') as f, mm_open(f) as mm:
+        header_end = mm.find(b'\n') + 1 or size
+        bounds = [header_end]
+        while bounds[-1] < size:
+            cut = mm.find(b'\n', bounds[-1] + chunk_size)
+            bounds.append(size if cut == -1 else cut + 1)
+
+        # Line number of each range's first row (header is line 1)
+        shards = []
+        first_line = 2
+        parts = len(bounds) - 1
+        for part in range(parts):
+            start, end = bounds[part], bounds[part + 1]
+            shards.append((path, start, end, first_line, part + 1, parts, date_path))
+            if part < parts - 1:  # the last range's line count is never needed
+                first_line += mm[start:end].count(b'\n')
+    return shards
+
+def base_name(path):
+    """orders_20251014.csv -> orders_20251014"""
+    return os.path.basename(path).replace('.csv', '')
+
+def output_name(path, part, parts):
+    """orders_20251014 or orders_20251014_part002 for split files"""
+    name = base_name(path)
+    return f"{name}_part{part:03d}" if parts > 1 else name
+
+def find_name_collisions(files):
+    """Inputs that would write the same output files (same name, different dirs)"""
+    by_name = {}
+    for path in files:
+        by_name.setdefault(base_name(path), []).append(path)
+    return {name: paths for name, paths in by_name.items() if len(paths) > 1}
+
+def remove_outputs(output_root, date_path, path, suffix=''):
+    """
+    Delete a file's outputs (any part count) so none are double-counted
+    suffix='.tmp' removes staged outputs of a failed file instead
+    """
+    name = glob.escape(base_name(path))
+    patterns = [
+        os.path.join(output_root, 'processed', date_path, f"{name}.json{suffix}"),
+        os.path.join(output_root, 'processed', date_path, f"{name}_part[0-9][0-9][0-9].json{suffix}"),
+        os.path.join(output_root, 'quarantine', date_path, f"{name}.csv{suffix}"),
+        os.path.join(output_root, 'quarantine', date_path, f"{name}_part[0-9][0-9][0-9].csv{suffix}"),
+    ]
+    for pattern in patterns:
+        for old in glob.glob(pattern):
+            os.remove(old)
+
+def process_shard(shard, output_root):
+    """
+    Worker: validate/transform one row range of a memory-mapped CSV
+    Outputs are written as *.tmp; finalize_file() moves them into place
+    """
+    path, start, end, first_line, part, parts, date_path = shard
+    processor = load_processor_module()
+
+    name = output_name(path, part, parts)
+    output_path = os.path.join(output_root, 'processed', date_path, f"{name}.json")
+    quarantine_path = os.path.join(output_root, 'quarantine', date_path, f"{name}.csv")
+
+    with open(path, 'rb') as f, mm_open(f) as mm:
+        header_end = mm.find(b'\n') + 1 or len(mm)
+        fieldnames = next(csv.reader([mm[:header_end].decode('utf-8-sig')]))
+
+        quarantine = LocalQuarantineWriter(f"{quarantine_path}.tmp", fieldnames, processor)
+        errors = processor.ErrorCollector(quarantine)
+        text = io.TextIOWrapper(io.BufferedReader(MappedRange(mm, start, end)), encoding='utf-8', newline='')
+        try:
+            rows = csv.DictReader(text, fieldnames=fieldnames)
+            # reader.line_num counts from 1 at this range's first line
+            valid_orders = processor.process_rows(rows, errors, line_offset=first_line - 1)
+        finally:
+            quarantine.close()
+            text.close()
+
+    staged = []
+    if quarantine.file is not None:
+        staged.append((f"{quarantine_path}.tmp", quarantine_path))
+    if valid_orders:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(f"{output_path}.tmp", 'w', encoding='utf-8') as out:
+            json.dump(valid_orders, out)
+        staged.append((f"{output_path}.tmp", output_path))
+
+    return {
+        'bytes': end - start,
+        'valid': len(valid_orders),
+        'errors': errors.total,
+        'by_type': dict(errors.by_type),
+        'staged': staged
+    }
+
+def finalize_file(output_root, date_path, path, results):
+    """All parts of a file succeeded: replace its previous outputs with the staged ones"""
+    remove_outputs(output_root, date_path, path)
+    for result in results:
+        for tmp, final in result['staged']:
+            os.replace(tmp, final)
+
+def main():
+    parser = argparse.ArgumentParser(description='Process local order CSVs with all CPU cores')
+    parser.add_argument('inputs', nargs='+', help='CSV files or directories (searched recursively)')
+    parser.add_argument('--output', default='output', help='Root for processed/ and quarantine/')
+    parser.add_argument('--pattern', default='orders_*.csv')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--chunk-mb', type=int, default=64, help='Split files larger than this into row ranges')
+    args = parser.parse_args()
+
+    files = find_csv_files(args.inputs, args.pattern)
+    if not files:
+        parser.error('no CSV files found')
+
+    collisions = find_name_collisions(files)
+    if collisions:
+        for name, paths in sorted(collisions.items()):
+            print(f"❌ {name}: {', '.join(paths)}")
+        parser.error('input files with the same name would overwrite each other')
+
+    dated = {path: file_date_path(path) for path in files}
+    undated = [path for path, date_path in dated.items() if date_path is None]
+    if undated:
+        for path in undated:
+            print(f"❌ {path}")
+        parser.error('input files need a YYYYMMDD date in their name (e.g. orders_20251014.csv)')
+
+    started = datetime.utcnow()
+    shards = []
+    for path in files:
+        shards.extend(plan_shards(path, args.chunk_mb * 1024 * 1024, dated[path]))
+    print(f"📁 {len(files)} files -> {len(shards)} shards on {args.workers} workers")
+
+    # Per-file bookkeeping: a file is finalized once all of its parts are back
+    pending = Counter(shard[0] for shard in shards)
+    file_results = {path: [] for path in pending}
+    failed = {}
+
+    total_bytes = valid = errors = 0
+    by_type = Counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=load_processor_module) as executor:
+        futures = {executor.submit(process_shard, shard, args.output): shard for shard in shards}
+        for future in as_completed(futures):
+            path = futures[future][0]
+            try:
+                file_results[path].append(future.result())
+            except Exception as e:
+                failed.setdefault(path, f"{type(e).__name__}: {e}")
+            pending[path] -= 1
+            if pending[path]:
+                continue
+
+            if path in failed:
+                # Drop its staged *.tmp outputs; previous outputs stay untouched
+                remove_outputs(args.output, dated[path], path, suffix='.tmp')
+                continue
+            finalize_file(args.output, dated[path], path, file_results[path])
+            for result in file_results[path]:
+                total_bytes += result['bytes']
+                valid += result['valid']
+                errors += result['errors']
+                by_type.update(result['by_type'])
+
+    elapsed = max((datetime.utcnow() - started).total_seconds(), 1e-6)
+    rows = valid + errors
+    print(f"✅ Valid: {valid:,}, Errors: {errors:,}" + (f" {dict(by_type)}" if errors else ''))
+    print(f"⏱️ {elapsed:.2f}s | {rows / elapsed:,.0f} rows/s | {total_bytes / elapsed / 1024 / 1024:,.1f} MB/s")
+    print(f"💾 Output: {os.path.join(args.output, 'processed')}")
+
+    if failed:
+        print(f"⚠️ {len(failed)} files failed (previous outputs kept):")
+        for path, error in sorted(failed.items()):
+            print(f"❌ {path}: {error}")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
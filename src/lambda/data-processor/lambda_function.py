@@ -3,13 +3,26 @@
 
 import json
 import csv
-import boto3
 from datetime import datetime
 from io import StringIO
 import re
+import random
+from collections import Counter
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+try:
+    import boto3
+except ImportError:
+    boto3 = None  # local batch runs (process_local.py) never touch S3
 
 # Initialize AWS clients (reused across invocations)
-s3 = boto3.client('s3')
+s3 = boto3.client('s3') if boto3 else None
+
+# Error handling limits - memory stays constant no matter how dirty the input is
+ERROR_SAMPLE_SIZE = 10                   # example bad rows kept (reservoir sample)
+QUARANTINE_PART_SIZE = 5 * 1024 * 1024   # S3 multipart minimum part size
+
+# Sanity cap on unit price: ₹1 crore (catalogue tops out around ₹1.2 lakh)
+MAX_PRICE_PAISE = 1_000_000_000
 
 def lambda_handler(event, context):
     """
@@ -35,60 +48,58 @@ def lambda_handler(event, context):
         csv_data = response['Body'].read().decode('utf-8')
         
         # Process orders
-        valid_orders = []
-        errors = []
+        reader = csv.DictReader(StringIO(csv_data))
+        
+        # Rejected raw rows are streamed to quarantine/ as they are found
+        processed_bucket = bucket.replace('raw-data', 'processed')
+        date_path = file_date.strftime('%Y/%m/%d')  # Use file date here!
+        timestamp = datetime.utcnow().strftime('%H%M%S')
+        filename = key.split('/')[-1].replace('.csv', '')
+        quarantine_key = f"quarantine/{date_path}/{filename}_{timestamp}.csv"
+        quarantine = S3QuarantineWriter(processed_bucket, quarantine_key, reader.fieldnames or [])
+        errors = ErrorCollector(quarantine)
         
-        for i, row in enumerate(csv.DictReader(StringIO(csv_data)), start=2):
+        try:
+            valid_orders = process_rows(reader, errors)
+            quarantine.close()
+        except Exception:
+            # Never leave an open multipart upload accruing storage,
+            # but don't let a failed abort hide the original error
             try:
-                # Quick validation and transformation
-                order = {
-                    'order_id': row['order_id'].strip(),
-                    'customer_name': row['customer_name'].strip(),
-                    'customer_email': row['customer_email'].strip(),
-                    'product': row['product'].strip(),
-                    'category': row['category'].strip(),
-                    'quantity': int(row['quantity']),
-                    'price': float(row['price']),
-                    'order_date': row['order_date'].strip(),
-                    'order_time': row.get('order_time', '00:00:00').strip(),
-                    'payment_method': row['payment_method'].strip(),
-                    'shipping_city': row['shipping_city'].strip(),
-                    'total': round(int(row['quantity']) * float(row['price']), 2),
-                    'processed_at': datetime.utcnow().isoformat()
-                }
-                
-                # Simple validation
-                if order['quantity'] <= 0 or order['price'] <= 0:
-                    raise ValueError("Invalid quantity or price")
-                
-                valid_orders.append(order)
-                
-            except Exception as e:
-                errors.append(f"Row {i}: {str(e)}")
-        
-        print(f"Valid: {len(valid_orders)}, Errors: {len(errors)}")
+                quarantine.abort()
+            except Exception as abort_error:
+                print(f"⚠️ Could not abort quarantine upload: {abort_error}")
+            raise
+        
+        error_summary = errors.summary()
+        print(f"Valid: {len(valid_orders)}, Errors: {errors.total}")
+        if errors.total:
+            print(f"Error summary: {json.dumps(error_summary)}")
+            print(f"Quarantined to: s3://{processed_bucket}/{quarantine_key}")
         
         if not valid_orders:
-            return {'statusCode': 400, 'body': 'No valid orders'}
+            return {'statusCode': 400, 'body': json.dumps({'message': 'No valid orders', 'errors': error_summary})}
         
         # Upload to processed bucket (using FILE date, not today)
-        processed_bucket = bucket.replace('raw-data', 'processed')
-        date_path = file_date.strftime('%Y/%m/%d')  # Use file date here!
-        timestamp = datetime.utcnow().strftime('%H%M%S')
-        filename = key.split('/')[-1].replace('.csv', '')
         output_key = f"processed/{date_path}/{filename}_{timestamp}.json"
         
+        metadata = {
+            'original-file': key,
+            'file-date': str(file_date),
+            'processed-at': datetime.utcnow().isoformat(),
+            'order-count': str(len(valid_orders)),
+            'error-count': str(errors.total),
+            'error-summary': errors.metadata_summary()
+        }
+        if errors.total:
+            metadata['quarantine-key'] = quarantine_key
+        
         s3.put_object(
             Bucket=processed_bucket,
             Key=output_key,
             Body=json.dumps(valid_orders),
             ContentType='application/json',
-            Metadata={
-                'original-file': key,
-                'file-date': str(file_date),
-                'processed-at': datetime.utcnow().isoformat(),
-                'order-count': str(len(valid_orders))
-            }
+            Metadata=metadata
         )
         
         print(f"Saved to: s3://{processed_bucket}/{output_key}")
@@ -97,7 +108,7 @@ def lambda_handler(event, context):
             'statusCode': 200,
             'body': json.dumps({
                 'processed': len(valid_orders),
-                'errors': len(errors),
+                'errors': error_summary,
                 'output': output_key,
                 'file_date': str(file_date)
             })
@@ -131,4 +142,209 @@ def extract_date_from_filename(key):
     except Exception as e:
         print(f"⚠️ Could not extract date from filename: {e}")
         print(f"⚠️ Falling back to today's date")
-        return datetime.utcnow().date()
\ No newline at end of file
+        return datetime.utcnow().date()
+
+def process_rows(reader, errors, line_offset=0):
+    """
+    Validate and transform csv.DictReader rows into orders
+    Bad rows go to the ErrorCollector; shared with process_local.py
+    Line numbers come from reader.line_num (blank lines are skipped but
+    still counted) plus line_offset for readers that start mid-file
+    """
+    valid_orders = []
+    for row in reader:
+        try:
+            valid_orders.append(parse_order(row))
+        except Exception as e:
+            errors.add(reader.line_num + line_offset, row, e)
+    return valid_orders
+
+class RowError(ValueError):
+    """A row rejected by validation - knows which field and why"""
+    
+    def __init__(self, field, error_type, message):
+        super().__init__(message)
+        self.field = field
+        self.error_type = error_type
+
+def clean_field(row, field, default=None):
+    """Stripped string value of a CSV field (short rows give None)"""
+    value = row.get(field, default)
+    if value is None:
+        raise RowError(field, 'missing', f"Missing {field}")
+    return value.strip()
+
+def parse_order(row):
+    """
+    Validate and transform one CSV row into an order dict
+    Raises RowError naming the offending field
+    """
+    quantity_text = clean_field(row, 'quantity')
+    try:
+        quantity = int(quantity_text)
+    except ValueError:
+        raise RowError('quantity', 'invalid_int', f"Invalid quantity {quantity_text!r}")
+    
+    price_text = clean_field(row, 'price')
+    try:
+        price_paise = parse_paise(price_text)
+    except ValueError:
+        raise RowError('price', 'invalid_number', f"Invalid price {price_text!r}")
+    
+    # Simple validation
+    if quantity <= 0:
+        raise RowError('quantity', 'out_of_range', f"Invalid quantity {quantity}")
+    if price_paise <= 0 or price_paise > MAX_PRICE_PAISE:
+        raise RowError('price', 'out_of_range', f"Invalid price {price_text!r}")
+    
+    return {
+        'order_id': clean_field(row, 'order_id'),
+        'customer_name': clean_field(row, 'customer_name'),
+        'customer_email': clean_field(row, 'customer_email'),
+        'product': clean_field(row, 'product'),
+        'category': clean_field(row, 'category'),
+        'quantity': quantity,
+        'price_paise': price_paise,
+        'order_date': clean_field(row, 'order_date'),
+        'order_time': clean_field(row, 'order_time', '00:00:00'),
+        'payment_method': clean_field(row, 'payment_method'),
+        'shipping_city': clean_field(row, 'shipping_city'),
+        'total_paise': quantity * price_paise,
+        'processed_at': datetime.utcnow().isoformat()
+    }
+
+def parse_paise(text):
+    """
+    Rupee string ('4403', '1299.50') -> exact integer paise (440300, 129950)
+    Parsed once at ingest so money is never a float downstream
+    """
+    try:
+        amount = Decimal(text)
+        if not amount.is_finite():
+            raise ValueError(f"Invalid amount {text!r}")
+        # quantize raises InvalidOperation past the context precision (e.g. '1e40')
+        return int((amount * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount {text!r}")
+
+class ErrorCollector:
+    """
+    Bounded-memory error tracking
+    Counters per field / error type, a reservoir sample of example rows,
+    and every rejected raw row forwarded to a quarantine writer
+    """
+    
+    def __init__(self, quarantine=None, sample_size=ERROR_SAMPLE_SIZE):
+        self.quarantine = quarantine
+        self.sample_size = sample_size
+        self.total = 0
+        self.by_type = Counter()
+        self.by_field = Counter()
+        self.samples = []
+    
+    def add(self, line, row, error):
+        self.total += 1
+        field = getattr(error, 'field', '_row')
+        error_type = getattr(error, 'error_type', type(error).__name__)
+        self.by_type[error_type] += 1
+        self.by_field[field] += 1
+        
+        # Reservoir sampling (Algorithm R) - every bad row equally likely to be kept
+        example = {'line': line, 'field': field, 'type': error_type, 'error': str(error)}
+        if len(self.samples) < self.sample_size:
+            self.samples.append(example)
+        else:
+            slot = random.randint(0, self.total - 1)
+            if slot < self.sample_size:
+                self.samples[slot] = example
+        
+        if self.quarantine is not None:
+            self.quarantine.write(line, row, error)
+    
+    def summary(self):
+        return {
+            'total': self.total,
+            'by_type': dict(self.by_type),
+            'by_field': dict(self.by_field),
+            'samples': self.samples
+        }
+    
+    def metadata_summary(self):
+        """Compact JSON for S3 metadata (2 KB limit - counters only, no samples)"""
+        summary = json.dumps({'by_type': dict(self.by_type), 'by_field': dict(self.by_field)},
+                             separators=(',', ':'))
+        return summary if len(summary) <= 1024 else json.dumps({'total': self.total})
+
+def quarantine_header(fieldnames):
+    """CSV header of a quarantine file"""
+    return ['line', 'error'] + list(fieldnames)
+
+def quarantine_record(fieldnames, line, row, error):
+    """One rejected raw row as a quarantine CSV record"""
+    values = [row.get(f) or '' for f in fieldnames]
+    values += row.get(None) or []  # extra columns on long rows
+    return [line, str(error)] + values
+
+class S3QuarantineWriter:
+    """
+    Stream rejected raw rows to S3 as CSV via multipart upload
+    Buffers at most one part in memory; nothing is written if there are no errors
+    """
+    
+    def __init__(self, bucket, key, fieldnames):
+        self.bucket = bucket
+        self.key = key
+        self.fieldnames = list(fieldnames)
+        self.buffer = StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.writer.writerow(quarantine_header(self.fieldnames))
+        self.rows = 0
+        self.upload_id = None
+        self.parts = []
+    
+    def write(self, line, row, error):
+        self.writer.writerow(quarantine_record(self.fieldnames, line, row, error))
+        self.rows += 1
+        if self.buffer.tell() >= QUARANTINE_PART_SIZE:
+            self._flush_part()
+    
+    def _flush_part(self):
+        if self.upload_id is None:
+            response = s3.create_multipart_upload(Bucket=self.bucket, Key=self.key, ContentType='text/csv')
+            self.upload_id = response['UploadId']
+        part_number = len(self.parts) + 1
+        response = s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=self.buffer.getvalue().encode('utf-8')
+        )
+        self.parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+        self.buffer.seek(0)
+        self.buffer.truncate()
+    
+    def close(self):
+        if not self.rows:
+            return
+        if self.upload_id is None:
+            # Small quarantine - a single put is enough
+            s3.put_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Body=self.buffer.getvalue().encode('utf-8'),
+                ContentType='text/csv'
+            )
+            return
+        if self.buffer.tell():
+            self._flush_part()
+        s3.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={'Parts': self.parts}
+        )
+    
+    def abort(self):
+        if self.upload_id is not None:
+            s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
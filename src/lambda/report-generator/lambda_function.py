@@ -6,6 +6,7 @@ import json
 import boto3
 from datetime import datetime, timedelta
 from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
 import os
 
 # Initialize clients ONCE (reused across invocations)
@@ -25,10 +26,13 @@ def lambda_handler(event, context):
     
     Can also be triggered manually with a specific date:
     {
-        "report_date": "2025-10-14"  # Optional: YYYY-MM-DD format
+        "report_date": "2025-10-14",  # Optional: YYYY-MM-DD format
+        "send_email": false,          # Optional: skip all emails, incl. errors (backfills)
+        "strict": true                # Optional: fail on S3 read errors instead of skipping
     }
     """
     print("🚀 Starting report generation")
+    notify = event.get('send_email', True) if event else True
     
     try:
         # Check if specific date requested (for manual triggers)
@@ -40,67 +44,95 @@ def lambda_handler(event, context):
             report_date = (datetime.utcnow() - timedelta(days=1)).date()
             print(f"📅 Scheduled trigger - Report date: {report_date}")
         
-        # Fetch orders (fast)
-        orders = fetch_orders(report_date)
-        
-        if not orders:
-            print("⚠️ No orders found")
-            send_no_data_email(report_date)
-            return {'statusCode': 200, 'body': 'No orders to report'}
-        
-        print(f"✅ Found {len(orders)} orders")
-        
-        # Calculate metrics (optimized)
-        metrics = calculate_metrics(orders)
-        
-        # Generate HTML (fast)
-        html = generate_html(report_date, metrics)
-        
-        # Save to S3
-        save_report(html, report_date)
-        
-        # Send email
-        send_email(html, report_date, metrics)
+        strict = event.get('strict', False) if event else False
+        result = build_daily_report(report_date, notify=notify, strict=strict)
         
         print("✅ Report generation completed")
         return {
             'statusCode': 200,
-            'body': json.dumps({
-                'date': str(report_date),
-                'orders': len(orders),
-                'revenue': metrics['revenue']
-            })
+            'body': json.dumps(result)
         }
         
     except Exception as e:
         print(f"❌ ERROR: {str(e)}")
         # Send error notification
-        try:
-            send_error_email(str(e))
-        except:
-            pass
+        if notify:
+            try:
+                send_error_email(str(e))
+            except:
+                pass
         raise
 
-def fetch_orders(date):
+def build_daily_report(report_date, notify=True, strict=False):
+    """
+    Build, save and (optionally) email the report for one day
+    Also stores the day's partial aggregate so rollups never re-read orders
+    Shared by lambda_handler and backfill.py (strict=True: S3 errors raise)
+    """
+    # Fetch orders (fast)
+    orders, complete = fetch_orders(report_date, strict=strict)
+    
+    if not orders:
+        print("⚠️ No orders found")
+        if notify:
+            send_no_data_email(report_date)
+        # Overwrite any aggregate from an earlier run so rollups don't reuse stale data
+        store_daily_aggregate(aggregate_orders([]), report_date, complete, strict)
+        return {'date': str(report_date), 'orders': 0, 'revenue_paise': 0}
+    
+    print(f"✅ Found {len(orders)} orders")
+    
+    # Aggregate once, derive report metrics (persisted for rollups at the end)
+    aggregate = aggregate_orders(orders)
+    metrics = summarize_aggregate(aggregate)
+    
+    # Generate HTML (fast)
+    html = generate_html(report_date, metrics)
+    
+    # Save to S3
+    save_report(html, report_date)
+    
+    # Send email
+    if notify:
+        send_email(html, report_date, metrics)
+    
+    store_daily_aggregate(aggregate, report_date, complete, strict)
+    
+    return {
+        'date': str(report_date),
+        'orders': metrics['orders'],
+        'revenue_paise': metrics['revenue_paise']
+    }
+
+def fetch_orders(date, strict=False):
     """
     Fetch orders from S3 - OPTIMIZED
     Only reads JSONs, no complex parsing
+    Returns (orders, complete) - complete is False if any list/read failed
+    strict=True re-raises those errors instead (backfills must never record
+    a partially read day as done)
     """
     orders = []
+    complete = True
     prefix = f"processed/{date.strftime('%Y/%m/%d')}/"
     
     try:
-        # List all files for the date
-        response = s3.list_objects_v2(Bucket=PROCESSED_BUCKET, Prefix=prefix)
+        # List all files for the date (paginated - a page holds at most 1000 keys)
+        paginator = s3.get_paginator('list_objects_v2')
+        objects = [
+            obj
+            for page in paginator.paginate(Bucket=PROCESSED_BUCKET, Prefix=prefix)
+            for obj in page.get('Contents', [])
+        ]
         
-        if 'Contents' not in response:
+        if not objects:
             print(f"⚠️ No files found in s3://{PROCESSED_BUCKET}/{prefix}")
-            return orders
+            return orders, complete
         
-        print(f"📁 Found {len(response['Contents'])} files in {prefix}")
+        print(f"📁 Found {len(objects)} files in {prefix}")
         
         # Read each file
-        for obj in response['Contents']:
+        for obj in objects:
             try:
                 data = s3.get_object(Bucket=PROCESSED_BUCKET, Key=obj['Key'])
                 content = data['Body'].read().decode('utf-8')
@@ -116,30 +148,44 @@ def fetch_orders(date):
                     
             except Exception as e:
                 print(f"⚠️ Error reading {obj['Key']}: {e}")
+                if strict:
+                    raise
+                complete = False
                 continue
         
-        return orders
+        return orders, complete
         
     except Exception as e:
         print(f"❌ Error fetching orders: {e}")
-        return []
+        if strict:
+            raise
+        return [], False
+
+def order_total_paise(order):
+    """
+    Order total in integer paise
+    Falls back to the float rupee 'total' of files processed before paise columns
+    """
+    if 'total_paise' in order:
+        return int(order['total_paise'])
+    return int((Decimal(str(order.get('total', 0))) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
 
-def calculate_metrics(orders):
+def aggregate_orders(orders):
     """
-    Calculate metrics - OPTIMIZED with defaultdict
-    Single pass through data
+    Build a mergeable partial aggregate - single pass through data
+    Keeps full per-key totals (no top-N cut) so days can be merged later
     """
     # Initialize
     total_revenue = 0
     unique_customers = set()
-    products = defaultdict(lambda: {'qty': 0, 'revenue': 0, 'orders': 0})
-    categories = defaultdict(lambda: {'orders': 0, 'revenue': 0})
+    products = defaultdict(lambda: {'qty': 0, 'revenue_paise': 0, 'orders': 0})
+    categories = defaultdict(lambda: {'orders': 0, 'revenue_paise': 0})
     payments = defaultdict(int)
-    cities = defaultdict(lambda: {'orders': 0, 'revenue': 0})
+    cities = defaultdict(lambda: {'orders': 0, 'revenue_paise': 0})
     
     # Single loop - calculate everything at once
     for order in orders:
-        revenue = order.get('total', 0)
+        revenue = order_total_paise(order)
         total_revenue += revenue
         
         # Unique customers
@@ -148,13 +194,13 @@ def calculate_metrics(orders):
         # Products
         product = order.get('product', 'Unknown')
         products[product]['qty'] += order.get('quantity', 0)
-        products[product]['revenue'] += revenue
+        products[product]['revenue_paise'] += revenue
         products[product]['orders'] += 1
         
         # Categories
         category = order.get('category', 'Other')
         categories[category]['orders'] += 1
-        categories[category]['revenue'] += revenue
+        categories[category]['revenue_paise'] += revenue
         
         # Payments
         payments[order.get('payment_method', 'Unknown')] += 1
@@ -162,23 +208,79 @@ def calculate_metrics(orders):
         # Cities
         city = order.get('shipping_city', 'Unknown')
         cities[city]['orders'] += 1
-        cities[city]['revenue'] += revenue
+        cities[city]['revenue_paise'] += revenue
+    
+    return {
+        'revenue_paise': total_revenue,
+        'orders': len(orders),
+        'customers': sorted(unique_customers),
+        'products': dict(products),
+        'categories': dict(categories),
+        'payments': dict(payments),
+        'cities': dict(cities)
+    }
+
+def merge_aggregates(aggregates):
+    """Merge daily partial aggregates into one (for weekly/monthly rollups)"""
+    total_revenue = 0
+    total_orders = 0
+    unique_customers = set()
+    products = defaultdict(lambda: {'qty': 0, 'revenue_paise': 0, 'orders': 0})
+    categories = defaultdict(lambda: {'orders': 0, 'revenue_paise': 0})
+    payments = defaultdict(int)
+    cities = defaultdict(lambda: {'orders': 0, 'revenue_paise': 0})
+    
+    for agg in aggregates:
+        total_revenue += agg['revenue_paise']
+        total_orders += agg['orders']
+        unique_customers.update(agg['customers'])
+        
+        for name, stats in agg['products'].items():
+            for field, value in stats.items():
+                products[name][field] += value
+        for name, stats in agg['categories'].items():
+            for field, value in stats.items():
+                categories[name][field] += value
+        for name, count in agg['payments'].items():
+            payments[name] += count
+        for name, stats in agg['cities'].items():
+            for field, value in stats.items():
+                cities[name][field] += value
+    
+    return {
+        'revenue_paise': total_revenue,
+        'orders': total_orders,
+        'customers': sorted(unique_customers),
+        'products': dict(products),
+        'categories': dict(categories),
+        'payments': dict(payments),
+        'cities': dict(cities)
+    }
+
+def summarize_aggregate(agg):
+    """Turn a (daily or merged) aggregate into report metrics"""
+    total_revenue = agg['revenue_paise']
+    orders = agg['orders']
     
     # Sort top items
-    top_products = sorted(products.items(), key=lambda x: x[1]['revenue'], reverse=True)[:10]
-    top_cities = sorted(cities.items(), key=lambda x: x[1]['revenue'], reverse=True)[:5]
+    top_products = sorted(agg['products'].items(), key=lambda x: x[1]['revenue_paise'], reverse=True)[:10]
+    top_cities = sorted(agg['cities'].items(), key=lambda x: x[1]['revenue_paise'], reverse=True)[:5]
     
     return {
-        'revenue': round(total_revenue, 2),
-        'orders': len(orders),
-        'avg_order': round(total_revenue / len(orders), 2) if orders else 0,
-        'customers': len(unique_customers),
+        'revenue_paise': total_revenue,
+        'orders': orders,
+        'avg_order_paise': (total_revenue + orders // 2) // orders if orders else 0,
+        'customers': len(agg['customers']),
         'top_products': top_products,
-        'categories': sorted(categories.items(), key=lambda x: x[1]['revenue'], reverse=True),
-        'payments': sorted(payments.items(), key=lambda x: x[1], reverse=True),
+        'categories': sorted(agg['categories'].items(), key=lambda x: x[1]['revenue_paise'], reverse=True),
+        'payments': sorted(agg['payments'].items(), key=lambda x: x[1], reverse=True),
         'top_cities': top_cities
     }
 
+def format_rupees(paise):
+    """Integer paise -> '₹1,234' (nearest rupee, exact integer rounding)"""
+    return f"₹{(paise + 50) // 100:,}"
+
 def generate_html(date, m):
     """
     Generate HTML report - OPTIMIZED
@@ -186,13 +288,13 @@ def generate_html(date, m):
     """
     # Product table rows
     product_rows = ''.join([
-        f"<tr><td><b>#{i+1}</b></td><td>{p[0]}</td><td>{p[1]['orders']}</td><td>{p[1]['qty']}</td><td>₹{p[1]['revenue']:,.0f}</td></tr>"
+        f"<tr><td><b>#{i+1}</b></td><td>{p[0]}</td><td>{p[1]['orders']}</td><td>{p[1]['qty']}</td><td>{format_rupees(p[1]['revenue_paise'])}</td></tr>"
         for i, p in enumerate(m['top_products'])
     ])
     
     # Category table rows
     category_rows = ''.join([
-        f"<tr><td><b>{cat}</b></td><td>{stats['orders']}</td><td>₹{stats['revenue']:,.0f}</td><td>{stats['revenue']/m['revenue']*100:.1f}%</td></tr>"
+        f"<tr><td><b>{cat}</b></td><td>{stats['orders']}</td><td>{format_rupees(stats['revenue_paise'])}</td><td>{stats['revenue_paise']/m['revenue_paise']*100:.1f}%</td></tr>"
         for cat, stats in m['categories']
     ])
     
@@ -204,7 +306,7 @@ def generate_html(date, m):
     
     # City table rows
     city_rows = ''.join([
-        f"<tr><td>{city}</td><td>{stats['orders']}</td><td>₹{stats['revenue']:,.0f}</td></tr>"
+        f"<tr><td>{city}</td><td>{stats['orders']}</td><td>{format_rupees(stats['revenue_paise'])}</td></tr>"
         for city, stats in m['top_cities']
     ])
     
@@ -238,9 +340,9 @@ tr:hover{{background:#f8f9fa}}
 <h1>📊 Daily Sales Report - {date.strftime('%B %d, %Y')}</h1>
 
 <div class="g">
-<div class="k k1"><div class="l">Total Revenue</div><div class="v">₹{m['revenue']:,.0f}</div></div>
+<div class="k k1"><div class="l">Total Revenue</div><div class="v">{format_rupees(m['revenue_paise'])}</div></div>
 <div class="k k2"><div class="l">Total Orders</div><div class="v">{m['orders']}</div></div>
-<div class="k k3"><div class="l">Avg Order Value</div><div class="v">₹{m['avg_order']:,.0f}</div></div>
+<div class="k k3"><div class="l">Avg Order Value</div><div class="v">{format_rupees(m['avg_order_paise'])}</div></div>
 <div class="k k4"><div class="l">Unique Customers</div><div class="v">{m['customers']}</div></div>
 </div>
 
@@ -299,10 +401,52 @@ def save_report(html, date):
         print(f"⚠️ Error saving report: {e}")
         # Don't fail if S3 save fails, email is more important
 
+def aggregate_key(date):
+    """S3 key of the stored daily aggregate"""
+    return f"aggregates/daily/{date.strftime('%Y/%m')}/aggregate_{date.strftime('%Y%m%d')}.json"
+
+def store_daily_aggregate(aggregate, date, complete, strict):
+    """
+    Persist the day's aggregate only if every order file was read
+    Outside strict mode a failed save is logged, never fatal (like save_report)
+    """
+    if not complete:
+        print("⚠️ Orders only partially read - aggregate not saved")
+        return
+    try:
+        save_daily_aggregate(aggregate, date)
+    except Exception as e:
+        if strict:
+            raise
+        print(f"⚠️ Error saving aggregate: {e}")
+
+def save_daily_aggregate(aggregate, date):
+    """Save the day's partial aggregate so rollups can reuse it"""
+    key = aggregate_key(date)
+    s3.put_object(
+        Bucket=REPORTS_BUCKET,
+        Key=key,
+        Body=json.dumps(aggregate).encode('utf-8'),
+        ContentType='application/json',
+        Metadata={
+            'report-date': str(date),
+            'generated-at': datetime.utcnow().isoformat()
+        }
+    )
+    print(f"💾 Aggregate saved: s3://{REPORTS_BUCKET}/{key}")
+
+def load_daily_aggregate(date):
+    """Load a stored daily aggregate, or None if that day was never built"""
+    try:
+        data = s3.get_object(Bucket=REPORTS_BUCKET, Key=aggregate_key(date))
+        return json.loads(data['Body'].read().decode('utf-8'))
+    except s3.exceptions.NoSuchKey:
+        return None
+
 def send_email(html, date, metrics):
     """Send email via SES - optimized"""
     try:
-        subject = f"📊 Daily Sales Report - {date.strftime('%b %d, %Y')} | Revenue: ₹{metrics['revenue']:,.0f} | Orders: {metrics['orders']}"
+        subject = f"📊 Daily Sales Report - {date.strftime('%b %d, %Y')} | Revenue: {format_rupees(metrics['revenue_paise'])} | Orders: {metrics['orders']}"
         
         response = ses.send_email(
             Source=SENDER_EMAIL,